@@ -6,9 +6,9 @@ Date: September 2025
 
 import numpy as np
 from dataclasses import dataclass
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Union
 
-@dataclass
+@dataclass(slots=True)
 class MemeticFactors:
     """Data class for memetic fitness factors"""
     cognitive_simplicity: float  # 0-10
@@ -20,6 +20,10 @@ class MemeticFactors:
 class MemeticFitnessCalculator:
     """Calculate memetic fitness for political messages"""
     
+    # Upper bounds (days, inclusive) of each gratification-speed bin
+    _GRAT_THRESH = np.array([1, 7, 30, 365, 1825], dtype=np.float64)  # 1825 = 5 years
+    _GRAT_SCORES = np.array([10.0, 8.0, 6.0, 4.0, 2.0, 1.0])
+    
     def __init__(self, country: str = "Argentina"):
         self.country = country
         self.weights = {
@@ -29,6 +33,9 @@ class MemeticFitnessCalculator:
             'tangibility': 0.20,
             'entry_cost': 0.10
         }
+        self._factor_order = tuple(self.weights)
+        self._weights_ordered = tuple(self.weights[f] for f in self._factor_order)
+        self._weight_vec = np.array(self._weights_ordered)
         
         # Hofstede cultural dimensions for calibration
         self.hofstede = {
@@ -41,6 +48,24 @@ class MemeticFitnessCalculator:
             }
         }
         
+    @property
+    def country(self) -> str:
+        return self._country
+    
+    @country.setter
+    def country(self, country: str):
+        self._country = country
+        self._cultural_compat = {}
+    
+    @property
+    def hofstede(self) -> Dict[str, Dict[str, int]]:
+        return self._hofstede
+    
+    @hofstede.setter
+    def hofstede(self, hofstede: Dict[str, Dict[str, int]]):
+        self._hofstede = hofstede
+        self._cultural_compat = {}
+        
     def calculate_cognitive_simplicity(self, 
                                       flesch_score: float,
                                       propositions: int,
@@ -57,20 +82,14 @@ class MemeticFitnessCalculator:
         
         return (flesch_component + prop_penalty + cond_penalty) / 3
     
-    def calculate_gratification_speed(self, days_to_benefit: float) -> float:
-        """Calculate gratification speed score"""
-        if days_to_benefit <= 1:
-            return 10.0
-        elif days_to_benefit <= 7:
-            return 8.0
-        elif days_to_benefit <= 30:
-            return 6.0
-        elif days_to_benefit <= 365:
-            return 4.0
-        elif days_to_benefit <= 1825:  # 5 years
-            return 2.0
-        else:
-            return 1.0
+    def calculate_gratification_speed(self,
+                                      days_to_benefit: Union[float, np.ndarray]
+                                      ) -> Union[float, np.ndarray]:
+        """Calculate gratification speed score (element-wise for arrays)"""
+        scores = self._GRAT_SCORES[np.searchsorted(self._GRAT_THRESH, days_to_benefit, side='left')]
+        if isinstance(days_to_benefit, np.ndarray):
+            return scores
+        return float(scores)
     
     def calculate_emotional_activation(self,
                                       valence: float,
@@ -109,6 +128,15 @@ class MemeticFitnessCalculator:
     
     def calculate_cultural_compatibility(self, meme_type: str) -> float:
         """Calculate cultural compatibility based on Hofstede dimensions"""
+        # Only depends on the country, so each meme type is scored once; setting
+        # country or hofstede clears the cache
+        kind = "populist" if meme_type == "populist" else "liberal"
+        if kind not in self._cultural_compat:
+            self._cultural_compat[kind] = self._compute_cultural_compatibility(kind)
+        return self._cultural_compat[kind]
+    
+    def _compute_cultural_compatibility(self, meme_type: str) -> float:
+        """Evaluate the Hofstede compatibility formula for a meme type"""
         hofstede = self.hofstede[self.country]
         
         if meme_type == "populist":
@@ -133,37 +161,56 @@ class MemeticFitnessCalculator:
     def calculate_total_fitness(self, 
                                factors: MemeticFactors,
                                meme_type: str,
-                               replication_fidelity: float = 0.95) -> Dict:
-        """Calculate total memetic fitness"""
-        
-        # Calculate weighted product
-        fitness_components = {
-            'cognitive_simplicity': factors.cognitive_simplicity,
-            'gratification_speed': factors.gratification_speed,
-            'emotional_activation': factors.emotional_activation,
-            'tangibility': factors.tangibility,
-            'entry_cost': factors.entry_cost
-        }
+                               replication_fidelity: float = 0.95,
+                               fast: bool = False) -> Union[Dict, float]:
+        """Calculate total memetic fitness (only total_fitness if fast=True)"""
         
         # Weighted geometric mean
-        fitness_base = 1.0
-        for factor, value in fitness_components.items():
-            weight = self.weights[factor]
-            fitness_base *= (value ** weight)
+        components = (factors.cognitive_simplicity,
+                      factors.gratification_speed,
+                      factors.emotional_activation,
+                      factors.tangibility,
+                      factors.entry_cost)
+        cs, gs, ea, tg, ec = components
+        w = self._weights_ordered
+        fitness_base = cs ** w[0] * gs ** w[1] * ea ** w[2] * tg ** w[3] * ec ** w[4]
         
         # Apply cultural compatibility and replication fidelity
         cultural_compat = self.calculate_cultural_compatibility(meme_type)
         
         total_fitness = fitness_base * replication_fidelity * cultural_compat
+        if fast:
+            return total_fitness
         
         return {
-            'components': fitness_components,
+            'components': dict(zip(self._factor_order, components)),
             'fitness_base': fitness_base,
             'cultural_compatibility': cultural_compat,
             'replication_fidelity': replication_fidelity,
             'total_fitness': total_fitness
         }
     
+    def score_batch(self,
+                    factor_matrix: np.ndarray,
+                    meme_types: np.ndarray,
+                    replication_fidelity: Union[float, np.ndarray] = 0.95) -> np.ndarray:
+        """Calculate total fitness for many memes at once
+        
+        factor_matrix is (N, 5) with columns ordered as self.weights;
+        meme_types is (N,) and, as in calculate_cultural_compatibility,
+        anything other than "populist" is scored as liberal.
+        """
+        factor_matrix = np.asarray(factor_matrix, dtype=np.float64)
+        cultural = np.where(np.asarray(meme_types) == "populist",
+                            self.calculate_cultural_compatibility("populist"),
+                            self.calculate_cultural_compatibility("liberal"))
+        return self._fitness_base_batch(factor_matrix) * replication_fidelity * cultural
+    
+    def _fitness_base_batch(self, factor_matrix: np.ndarray) -> np.ndarray:
+        """Weighted geometric mean of each row of an (N, 5) factor matrix"""
+        with np.errstate(divide='ignore'):
+            return np.exp(np.log(factor_matrix) @ self._weight_vec)
+    
     def compare_memes(self, 
                      populist_factors: MemeticFactors,
                      liberal_factors: MemeticFactors) -> Dict:
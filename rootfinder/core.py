@@ -5,15 +5,121 @@ Author: Ignacio Adrian Lerer
 Date: September 2025
 """
 
-import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, TextIO, Union
 from dataclasses import dataclass, field
 from datetime import datetime
-import networkx as nx
+from collections import defaultdict, deque
+from contextlib import nullcontext
+import csv
+import functools
 import json
+import types
 
-@dataclass
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+# networkx is imported lazily inside the methods that need it, so importing
+# rootfinder (e.g. just to build Policy objects) stays cheap.
+
+# Cell values treated as missing, matching pandas.read_csv's defaults
+_NA_VALUES = frozenset({
+    "", "NA", "N/A", "n/a", "NaN", "nan", "-NaN", "-nan", "#N/A", "#N/A N/A",
+    "#NA", "-1.#IND", "-1.#QNAN", "1.#IND", "1.#QNAN", "<NA>", "NULL", "null",
+    "None"
+})
+
+# Array code of a missing policy_type/ideology. Like pandas' NaN, a missing
+# value never matches anything, not even another missing value
+_MISSING_CODE = -1
+# Lookup code for a value no loaded policy has
+_UNKNOWN_CODE = -2
+
+def _parse_str(value: str) -> Optional[str]:
+    """Return a CSV cell as a string, or None if it is a missing value"""
+    return None if value in _NA_VALUES else value
+
+def _parse_year(value: str) -> Optional[int]:
+    """Parse a year cell, tolerating float formatting such as '2020.0'"""
+    return None if value in _NA_VALUES else int(float(value))
+
+def _dumps_json(data) -> bytes:
+    """Serialize to 2-space indented UTF-8 JSON, via orjson when available
+
+    The two backends agree except for float exponents: orjson writes 1e-7
+    and 1e20 where json writes 1e-07 and 1e+20, so exports holding such
+    floats are not byte-identical across installs (they parse the same).
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _category_code(codes: Dict[str, int], value: Optional[str]) -> int:
+    """Integer code for a categorical value, assigned in first-seen order"""
+    if value is None:
+        return _MISSING_CODE
+    return codes.setdefault(value, len(codes))
+
+def _has_cycle(parent: Dict[str, str]) -> bool:
+    """Whether following child -> parent links from any policy loops back"""
+    state: Dict[str, bool] = {}  # False while on the current walk, True once cleared
+    for start in parent:
+        path = []
+        node = start
+        while node in parent and node not in state:
+            state[node] = False
+            path.append(node)
+            node = parent[node]
+        if state.get(node) is False:
+            return True
+        for visited in path:
+            state[visited] = True
+    return False
+
+# numba is optional and costs far more to import than the rest of rootfinder,
+# so kernels are compiled on their first call (plain Python without numba)
+prange = range  # kernels' parallel loops; the compiled copy sees numba.prange
+
+# Below this many policies the plain-Python phenotype scan finishes long
+# before numba could load (let alone compile) the kernel
+_JIT_MIN_POLICIES = 20_000
+
+def _compile_kernel(func, options):
+    try:
+        import numba
+    except ImportError:
+        return func
+    if options.get("parallel"):
+        # Compile a copy whose globals bind prange to numba.prange, leaving
+        # the module (and the plain-Python func) on the builtin range
+        func = types.FunctionType(func.__code__, {**func.__globals__, "prange": numba.prange},
+                                  func.__name__, func.__defaults__, func.__closure__)
+    return numba.njit(**options)(func)
+
+def njit(*args, **options):
+    """Lazy numba.njit: compile the decorated kernel on its first call
+
+    The uncompiled function stays available as kernel.py_func.
+    """
+    def decorate(func):
+        impl = None
+        
+        @functools.wraps(func)
+        def kernel(*call_args):
+            nonlocal impl
+            if impl is None:
+                impl = _compile_kernel(func, options)
+            return impl(*call_args)
+        kernel.py_func = func
+        return kernel
+    
+    if args and callable(args[0]):
+        return decorate(args[0])
+    return decorate
+
+@dataclass(slots=True)
 class Policy:
     """Represents a single policy with genealogical information"""
     id: str
@@ -21,10 +127,12 @@ class Policy:
     year_created: int
     year_terminated: Optional[int] = None
     parent_id: Optional[str] = None
-    policy_type: str = ""
-    government: str = ""
-    ideology: str = ""
+    policy_type: Optional[str] = ""
+    government: Optional[str] = ""
+    ideology: Optional[str] = ""
     components: Dict = field(default_factory=dict)
+    # survival_years as of the corpus load, so it skips datetime.now()
+    _survival_cached: Optional[int] = field(default=None, init=False, repr=False, compare=False)
     
     @property
     def is_active(self) -> bool:
@@ -32,10 +140,12 @@ class Policy:
     
     @property
     def survival_years(self) -> int:
+        if self._survival_cached is not None:
+            return self._survival_cached
         end_year = self.year_terminated or datetime.now().year
         return end_year - self.year_created
 
-@dataclass
+@dataclass(slots=True)
 class PolicyLineage:
     """Represents a policy's complete genealogical tree"""
     root_policy: Policy
@@ -43,6 +153,16 @@ class PolicyLineage:
     ancestors: List[Policy] = field(default_factory=list)
     siblings: List[Policy] = field(default_factory=list)
     inheritance_scores: Dict[str, float] = field(default_factory=dict)
+    _inheritance_arr: Optional[np.ndarray] = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def inheritance_array(self) -> np.ndarray:
+        """Inheritance scores as a float64 array, in inheritance_scores order"""
+        if self._inheritance_arr is None:
+            self._inheritance_arr = np.fromiter(self.inheritance_scores.values(),
+                                                dtype=np.float64,
+                                                count=len(self.inheritance_scores))
+        return self._inheritance_arr
     
     @property
     def total_descendants(self) -> int:
@@ -50,9 +170,9 @@ class PolicyLineage:
     
     @property
     def mean_inheritance(self) -> float:
-        if not self.inheritance_scores:
-            return 0.0
-        return np.mean(list(self.inheritance_scores.values()))
+        values = self.inheritance_scores.values()
+        n = len(values)
+        return sum(values) / n if n else 0.0
     
     @property
     def max_inheritance(self) -> float:
@@ -60,69 +180,281 @@ class PolicyLineage:
             return 0.0
         return max(self.inheritance_scores.values())
 
+@njit(parallel=True, cache=True)
+def _phenotype_scan(year_arr, type_id, ideo_id, parent_idx, preorder, subtree_start,
+                    subtree_size, survival_arr, reproductive_arr, threshold):
+    """Score every policy as an extended phenotype from preorder subtree ranges"""
+    n = year_arr.shape[0]
+    scores = np.empty(n, dtype=np.float64)
+    
+    for i in prange(n):
+        start = subtree_start[i] + 1
+        count = subtree_size[i] - 1
+        
+        # Heritability: mean inheritance over all descendants of i
+        total = 0.0
+        for k in range(start, start + count):
+            d = preorder[k]
+            score = max(0.0, 1.0 - abs(year_arr[d] - year_arr[i]) / 50) * 0.3
+            if type_id[d] == type_id[i] and type_id[i] != _MISSING_CODE:
+                score += 0.3
+            if ideo_id[d] == ideo_id[i] and ideo_id[i] != _MISSING_CODE:
+                score += 0.3
+            if parent_idx[d] == i:
+                score += 0.1
+            total += min(score, 1.0)
+        heritability = total / count if count > 0 else 0.0
+        
+        env_mod = min(count / 10, 1.0)
+        persistence = min(survival_arr[i] / 50, 1.0)
+        
+        scores[i] = (env_mod * 0.25 +
+                     persistence * 0.25 +
+                     heritability * 0.25 +
+                     reproductive_arr[i] * 0.25)
+    
+    return scores >= threshold, scores
+
 class PolicyGenealogy:
     """Main class for tracking policy genealogies"""
     
     def __init__(self):
         self.policies: Dict[str, Policy] = {}
-        self.genealogy_graph = nx.DiGraph()
+        self.genealogy_graph = None  # nx.DiGraph, created on first load_corpus
+        self.corpus_loaded = False
+        self._lineage_cache: Dict[str, PolicyLineage] = {}
+        self._parent: Dict[str, str] = {}
+        self._children: Dict[str, List[str]] = defaultdict(list)
+        self._igraph = None
+        self._build_arrays()
+    
+    def reset(self):
+        """Drop the loaded corpus, returning to the freshly constructed state"""
+        self.policies.clear()
+        if self.genealogy_graph is not None:
+            self.genealogy_graph.clear()
         self.corpus_loaded = False
+        self._lineage_cache.clear()
+        self._igraph = None
+        self._build_arrays()
         
-    def load_corpus(self, filepath: str):
-        """Load policy corpus from CSV file"""
-        df = pd.read_csv(filepath)
-        
-        for _, row in df.iterrows():
-            policy = Policy(
-                id=row['policy_id'],
-                name=row['policy_name'],
-                year_created=row['year_created'],
-                year_terminated=None if pd.isna(row['year_terminated']) else int(row['year_terminated']),
-                parent_id=None if pd.isna(row['parent_policy']) else row['parent_policy'],
-                policy_type=row['policy_type'],
-                government=row['government'],
-                ideology=row['ideological_orientation']
-            )
-            
+    def load_corpus(self, filepath: Union[str, TextIO]):
+        """Load policy corpus from a CSV file path or an open text stream"""
+        policies = []
+        if hasattr(filepath, 'read'):
+            source = nullcontext(filepath)
+        else:
+            source = open(filepath, newline='', encoding='utf-8')
+        with source as f:
+            for row in csv.DictReader(f):
+                policies.append(Policy(
+                    id=row['policy_id'],
+                    name=_parse_str(row['policy_name']),
+                    year_created=_parse_year(row['year_created']),
+                    year_terminated=_parse_year(row['year_terminated']),
+                    parent_id=_parse_str(row['parent_policy']),
+                    policy_type=_parse_str(row['policy_type']),
+                    government=_parse_str(row['government']),
+                    ideology=_parse_str(row['ideological_orientation'])
+                ))
+        
+        self.add_policies(policies)
+        print(f"Loaded {len(self.policies)} policies")
+    
+    def add_policies(self, policies: List[Policy]):
+        """Add Policy objects directly, rebuilding the lookup arrays once"""
+        import networkx as nx
+        
+        # Validate the merged parent links before touching any state, so a
+        # rejected batch leaves the genealogy exactly as it was
+        parent = {pid: p.parent_id for pid, p in self.policies.items() if p.parent_id}
+        for policy in policies:
+            parent.pop(policy.id, None)
+            if policy.parent_id:
+                parent[policy.id] = policy.parent_id
+        if _has_cycle(parent):
+            raise ValueError("Policy genealogy contains a cycle")
+        
+        if self.genealogy_graph is None:
+            self.genealogy_graph = nx.DiGraph()
+        
+        # A replaced policy may have moved to a new parent: drop its old in-edge
+        replaced = [policy.id for policy in policies if policy.id in self.policies]
+        self.genealogy_graph.remove_edges_from(list(self.genealogy_graph.in_edges(replaced)))
+        
+        nodes_to_add = []
+        edges_to_add = []
+        for policy in policies:
             self.policies[policy.id] = policy
-            self.genealogy_graph.add_node(policy.id, policy=policy)
+            nodes_to_add.append((policy.id, {'policy': policy}))
             
             if policy.parent_id:
-                self.genealogy_graph.add_edge(policy.parent_id, policy.id)
+                edges_to_add.append((policy.parent_id, policy.id))
+        
+        self.genealogy_graph.add_nodes_from(nodes_to_add)
+        self.genealogy_graph.add_edges_from(edges_to_add)
+        self._lineage_cache.clear()
+        self._igraph = None
+        self._build_arrays()
         
         self.corpus_loaded = True
-        print(f"Loaded {len(self.policies)} policies")
+    
+    def add_policy(self, policy: Policy):
+        """Add a single Policy (use add_policies for many; each call rebuilds the arrays)"""
+        self.add_policies([policy])
+        
+    def _build_arrays(self):
+        """Build parent/child maps, parallel arrays and a preorder subtree index"""
+        self._parent = {p.id: p.parent_id for p in self.policies.values() if p.parent_id}
+        self._children = defaultdict(list)
+        for pid, parent_id in self._parent.items():
+            self._children[parent_id].append(pid)
+        
+        self._policies_list = list(self.policies.values())
+        self._policies_arr = np.empty(len(self._policies_list), dtype=object)
+        self._policies_arr[:] = self._policies_list
+        self._id_index = {p.id: i for i, p in enumerate(self._policies_list)}
+        
+        # Integer codes for policy_type/ideology; they live only in this
+        # genealogy's arrays, never on the (possibly shared) Policy objects
+        self._type_codes: Dict[str, int] = {}
+        self._ideo_codes: Dict[str, int] = {}
+        type_codes = [_category_code(self._type_codes, p.policy_type) for p in self._policies_list]
+        ideo_codes = [_category_code(self._ideo_codes, p.ideology) for p in self._policies_list]
+        self._populist_code = self._ideo_codes.get("Populist", _UNKNOWN_CODE)
+        
+        current_year = datetime.now().year
+        for p in self._policies_list:
+            p._survival_cached = (p.year_terminated or current_year) - p.year_created
         
-    def trace_lineage(self, policy_id: str) -> PolicyLineage:
-        """Trace complete lineage of a policy"""
+        n = len(self._policies_list)
+        self._year_arr = np.fromiter((p.year_created for p in self._policies_list), dtype=np.int64, count=n)
+        self._type_code_arr = np.array(type_codes, dtype=np.int32)
+        self._ideo_code_arr = np.array(ideo_codes, dtype=np.int32)
+        self._survival_arr = np.fromiter((p._survival_cached for p in self._policies_list), dtype=np.int64, count=n)
+        self._parent_idx_arr = np.fromiter((self._id_index.get(p.parent_id, -1) for p in self._policies_list), dtype=np.int32, count=n)
+        
+        # DFS preorder from the roots. Each policy has at most one parent, so
+        # every subtree is a contiguous run: the descendants of policy i are
+        # preorder[subtree_start[i] + 1:subtree_start[i] + subtree_size[i]]
+        child_idx: List[List[int]] = [[] for _ in range(n)]
+        for i in range(n):
+            if self._parent_idx_arr[i] >= 0:
+                child_idx[self._parent_idx_arr[i]].append(i)
+        
+        preorder = []
+        stack = [i for i in range(n - 1, -1, -1) if self._parent_idx_arr[i] < 0]
+        while stack:
+            i = stack.pop()
+            preorder.append(i)
+            stack.extend(reversed(child_idx[i]))
+        if len(preorder) < n:
+            raise ValueError("Policy genealogy contains a cycle")
+        self._preorder = np.array(preorder, dtype=np.int32)
+        
+        self._subtree_start = np.empty(n, dtype=np.int64)
+        self._subtree_start[self._preorder] = np.arange(n)
+        
+        # Subtree sizes bottom-up (reverse preorder visits children first)
+        self._subtree_size = np.ones(n, dtype=np.int64)
+        for i in reversed(preorder):
+            if self._parent_idx_arr[i] >= 0:
+                self._subtree_size[self._parent_idx_arr[i]] += self._subtree_size[i]
+        
+    def node_degrees(self) -> Dict[str, int]:
+        """Total (in + out) degree of every node in the genealogy graph"""
+        if self.genealogy_graph is None:
+            return {}
+        try:
+            import igraph  # noqa: F401
+        except ImportError:  # igraph is optional; use networkx's degree view
+            return dict(self.genealogy_graph.degree())
+        graph = self._igraph_view()
+        return dict(zip(graph.vs['name'], graph.degree(mode='all')))
+    
+    def _igraph_view(self):
+        """igraph mirror of genealogy_graph, built once per corpus load"""
+        if self._igraph is None:
+            import igraph
+            
+            names = list(self.genealogy_graph.nodes)
+            vid = {name: i for i, name in enumerate(names)}
+            self._igraph = igraph.Graph(
+                n=len(names),
+                edges=[(vid[u], vid[v]) for u, v in self.genealogy_graph.edges],
+                directed=True
+            )
+            self._igraph.vs['name'] = names
+        return self._igraph
+    
+    def policies_array(self) -> np.ndarray:
+        """Every loaded Policy as an object array, in corpus order"""
+        return self._policies_arr
+    
+    def survival_years_array(self) -> np.ndarray:
+        """Survival years of every loaded policy, in corpus order"""
+        return self._survival_arr
+    
+    def ideology_mask(self, ideology: str) -> np.ndarray:
+        """Boolean mask over loaded policies (corpus order) with a given ideology"""
+        return self._ideo_code_arr == self._ideo_codes.get(ideology, _UNKNOWN_CODE)
+    
+    def mean_survival_by_ideology(self, ideology: str) -> float:
+        """Mean survival years of the loaded policies with a given ideology"""
+        mask = self.ideology_mask(ideology)
+        if not mask.any():
+            return 0.0
+        return float(self._survival_arr[mask].mean())
+        
+    def trace_lineage(self, policy_id: str, use_cache: bool = True) -> PolicyLineage:
+        """Trace complete lineage of a policy (cached until the next corpus load)"""
+        if use_cache and policy_id in self._lineage_cache:
+            return self._lineage_cache[policy_id]
         if policy_id not in self.policies:
             raise ValueError(f"Policy {policy_id} not found")
             
         policy = self.policies[policy_id]
         lineage = PolicyLineage(root_policy=policy)
         
-        # Find ancestors
-        ancestors = list(nx.ancestors(self.genealogy_graph, policy_id))
+        # Find ancestors (walk up the parent chain)
+        ancestors = []
+        seen = {policy_id}
+        current = policy_id
+        while (parent_id := self._parent.get(current)) and parent_id not in seen:
+            seen.add(parent_id)
+            ancestors.append(parent_id)
+            current = parent_id
         lineage.ancestors = [self.policies[aid] for aid in ancestors]
         
-        # Find descendants
-        descendants = list(nx.descendants(self.genealogy_graph, policy_id))
+        # Find descendants (BFS over the child lists)
+        descendants = []
+        seen = {policy_id}
+        queue = deque([policy_id])
+        while queue:
+            for child in self._children.get(queue.popleft(), ()):
+                if child not in seen:
+                    seen.add(child)
+                    descendants.append(child)
+                    queue.append(child)
         lineage.descendants = [self.policies[did] for did in descendants]
         
         # Find siblings (same parent)
         if policy.parent_id:
             siblings = [
                 self.policies[nid] 
-                for nid in self.genealogy_graph.successors(policy.parent_id)
+                for nid in self._children[policy.parent_id]
                 if nid != policy_id
             ]
             lineage.siblings = siblings
         
         # Calculate inheritance scores
-        for descendant in lineage.descendants:
-            score = self._calculate_inheritance(policy, descendant)
-            lineage.inheritance_scores[descendant.id] = score
-            
+        if lineage.descendants:
+            scores = self._calculate_inheritance_batch(policy, lineage.descendants)
+            lineage.inheritance_scores = dict(zip(descendants, scores.tolist()))
+            lineage._inheritance_arr = scores
+
+        if use_cache:
+            self._lineage_cache[policy_id] = lineage
         return lineage
     
     def _calculate_inheritance(self, parent: Policy, descendant: Policy) -> float:
@@ -134,12 +466,12 @@ class PolicyGenealogy:
         temporal_score = max(0, 1 - time_diff / 50)  # 50 years = 0 score
         score += temporal_score * 0.3
         
-        # Type similarity
-        if parent.policy_type == descendant.policy_type:
+        # Type similarity (a missing type matches nothing)
+        if parent.policy_type is not None and parent.policy_type == descendant.policy_type:
             score += 0.3
             
-        # Ideological alignment
-        if parent.ideology == descendant.ideology:
+        # Ideological alignment (a missing ideology matches nothing)
+        if parent.ideology is not None and parent.ideology == descendant.ideology:
             score += 0.3
             
         # Direct lineage bonus
@@ -147,15 +479,33 @@ class PolicyGenealogy:
             score += 0.1
             
         return min(score, 1.0)
-    
+
+    def _calculate_inheritance_batch(self, parent: Policy, descendants: List[Policy]) -> np.ndarray:
+        """Vectorized _calculate_inheritance over many descendants of one parent"""
+        idx = np.fromiter((self._id_index[d.id] for d in descendants), dtype=np.intp, count=len(descendants))
+        parent_idx = self._id_index[parent.id]
+
+        temporal = np.maximum(0, 1 - np.abs(self._year_arr[idx] - parent.year_created) / 50) * 0.3
+        parent_type = self._type_code_arr[parent_idx]
+        parent_ideo = self._ideo_code_arr[parent_idx]
+        type_match = ((self._type_code_arr[idx] == parent_type) & (parent_type != _MISSING_CODE)) * 0.3
+        ideo_match = ((self._ideo_code_arr[idx] == parent_ideo) & (parent_ideo != _MISSING_CODE)) * 0.3
+        direct = (self._parent_idx_arr[idx] == parent_idx) * 0.1
+
+        return np.minimum(temporal + type_match + ideo_match + direct, 1.0)
+
     def find_extended_phenotypes(self, threshold: float = 0.7) -> List[Policy]:
         """Identify policies that qualify as extended phenotypes"""
-        extended_phenotypes = []
+        if not self.corpus_loaded:
+            return []
         
-        for policy_id, policy in self.policies.items():
-            score = self._calculate_phenotype_score(policy)
-            if score >= threshold:
-                extended_phenotypes.append(policy)
+        reproductive_arr = np.where(self._ideo_code_arr == self._populist_code, 0.8, 0.3)
+        
+        scan = _phenotype_scan if len(self._policies_list) >= _JIT_MIN_POLICIES else _phenotype_scan.py_func
+        mask, _ = scan(self._year_arr, self._type_code_arr, self._ideo_code_arr,
+                       self._parent_idx_arr, self._preorder, self._subtree_start,
+                       self._subtree_size, self._survival_arr, reproductive_arr, threshold)
+        extended_phenotypes = [self._policies_list[i] for i in np.flatnonzero(mask)]
                 
         return sorted(extended_phenotypes, 
                      key=lambda p: p.survival_years, 
@@ -184,36 +534,49 @@ class PolicyGenealogy:
     
     def export_genealogy(self, policy_id: str, format: str = "json") -> str:
         """Export policy genealogy in specified format"""
+        return self._export_bytes(policy_id, format).decode('utf-8')
+    
+    def export_genealogy_to_file(self, policy_id: str, output_file: str, format: str = "json"):
+        """Write policy genealogy to a file without an intermediate str"""
+        data = self._export_bytes(policy_id, format)
+        with open(output_file, 'wb') as f:
+            f.write(data)
+    
+    def export_genealogy_dict(self, policy_id: str) -> Dict:
+        """Policy genealogy as the native dict that the JSON export serializes"""
         lineage = self.trace_lineage(policy_id)
         
-        if format == "json":
-            data = {
-                "root": {
-                    "id": lineage.root_policy.id,
-                    "name": lineage.root_policy.name,
-                    "year": lineage.root_policy.year_created,
-                    "survival_years": lineage.root_policy.survival_years
-                },
-                "ancestors": [
-                    {"id": a.id, "name": a.name, "year": a.year_created}
-                    for a in lineage.ancestors
-                ],
-                "descendants": [
-                    {
-                        "id": d.id, 
-                        "name": d.name, 
-                        "year": d.year_created,
-                        "inheritance": lineage.inheritance_scores.get(d.id, 0)
-                    }
-                    for d in lineage.descendants
-                ],
-                "statistics": {
-                    "total_descendants": lineage.total_descendants,
-                    "mean_inheritance": lineage.mean_inheritance,
-                    "max_inheritance": lineage.max_inheritance
+        return {
+            "root": {
+                "id": lineage.root_policy.id,
+                "name": lineage.root_policy.name,
+                "year": lineage.root_policy.year_created,
+                "survival_years": lineage.root_policy.survival_years
+            },
+            "ancestors": [
+                {"id": a.id, "name": a.name, "year": a.year_created}
+                for a in lineage.ancestors
+            ],
+            "descendants": [
+                {
+                    "id": d.id, 
+                    "name": d.name, 
+                    "year": d.year_created,
+                    "inheritance": lineage.inheritance_scores.get(d.id, 0)
                 }
+                for d in lineage.descendants
+            ],
+            "statistics": {
+                "total_descendants": lineage.total_descendants,
+                "mean_inheritance": lineage.mean_inheritance,
+                "max_inheritance": lineage.max_inheritance
             }
-            return json.dumps(data, indent=2)
+        }
+    
+    def _export_bytes(self, policy_id: str, format: str) -> bytes:
+        """Serialize policy genealogy in specified format as UTF-8 bytes"""
+        if format == "json":
+            return _dumps_json(self.export_genealogy_dict(policy_id))
         
         else:
             raise ValueError(f"Format {format} not supported")
@@ -221,6 +584,7 @@ class PolicyGenealogy:
     def visualize_genealogy(self, policy_id: str, output_file: str = None):
         """Create visualization of policy genealogy"""
         import matplotlib.pyplot as plt
+        import networkx as nx
         
         # Get subgraph for this policy's lineage
         lineage = self.trace_lineage(policy_id)
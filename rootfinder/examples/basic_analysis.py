@@ -77,23 +77,25 @@ def main():
     # Example 3: Compare ideologies
     print("=== EXAMPLE 3: Ideological Comparison ===")
     try:
-        populist_policies = [p for p in genealogy.policies.values() if p.ideology == "Populist"]
-        liberal_policies = [p for p in genealogy.policies.values() if p.ideology == "Liberal"]
+        survival = genealogy.survival_years_array()
+        policies = genealogy.policies_array()
         
-        pop_survival = [p.survival_years for p in populist_policies]
-        lib_survival = [p.survival_years for p in liberal_policies]
+        pop_mask = genealogy.ideology_mask("Populist")
+        lib_mask = genealogy.ideology_mask("Liberal")
+        pop_survival = survival[pop_mask]
+        lib_survival = survival[lib_mask]
         
-        print(f"Populist policies: {len(populist_policies)}")
-        print(f"  Mean survival: {sum(pop_survival)/len(pop_survival):.1f} years")
-        print(f"  Max survival: {max(pop_survival)} years")
+        print(f"Populist policies: {len(pop_survival)}")
+        print(f"  Mean survival: {genealogy.mean_survival_by_ideology('Populist'):.1f} years")
+        print(f"  Max survival: {pop_survival.max()} years")
         
-        print(f"\nLiberal policies: {len(liberal_policies)}")
-        print(f"  Mean survival: {sum(lib_survival)/len(lib_survival):.1f} years")
-        print(f"  Max survival: {max(lib_survival)} years")
+        print(f"\nLiberal policies: {len(lib_survival)}")
+        print(f"  Mean survival: {genealogy.mean_survival_by_ideology('Liberal'):.1f} years")
+        print(f"  Max survival: {lib_survival.max()} years")
         
         # Find most persistent of each ideology
-        most_persistent_pop = max(populist_policies, key=lambda p: p.survival_years)
-        most_persistent_lib = max(liberal_policies, key=lambda p: p.survival_years)
+        most_persistent_pop = policies[pop_mask][pop_survival.argmax()]
+        most_persistent_lib = policies[lib_mask][lib_survival.argmax()]
         
         print(f"\nMost persistent populist: {most_persistent_pop.name} ({most_persistent_pop.survival_years} years)")
         print(f"Most persistent liberal: {most_persistent_lib.name} ({most_persistent_lib.survival_years} years)")
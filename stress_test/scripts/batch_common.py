@@ -0,0 +1,62 @@
+"""
+RootFinder Stress Test - shared batch helpers
+Root tracing and score rounding used by both batch scripts
+
+Author: Ignacio Adrian Lerer
+Date: September 2025
+"""
+
+import os
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# Each root traces in well under a millisecond, so worker processes only pay
+# for their startup (and a copy of the genealogy) on much larger batches
+POOL_MIN_ROOTS = 200
+
+def trace_roots(analyze, genealogy, node_degree, tasks, parallel=None):
+    """Yield, in task order, a callable returning analyze(genealogy, node_degree, *task)
+
+    Calling it returns the task's result or raises its exception, so callers
+    handle per-root errors the same way on both paths. Tasks run serially
+    unless parallel is True, or None with at least POOL_MIN_ROOTS tasks.
+    """
+    if parallel is None:
+        parallel = len(tasks) >= POOL_MIN_ROOTS
+    if not parallel:
+        for task in tasks:
+            yield functools.partial(analyze, genealogy, node_degree, *task)
+        return
+
+    # Spawned workers, so a pool never forks while the logger's listener
+    # thread is running; each holds its own copy of the loaded genealogy
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(tasks)),
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(genealogy, node_degree)) as executor:
+        futures = [executor.submit(_trace_one, analyze, *task) for task in tasks]
+        for future in futures:
+            yield future.result
+
+# Per-process genealogy and degree map, installed once by the pool initializer
+_worker_state = {}
+
+def _init_worker(genealogy, node_degree):
+    _worker_state["genealogy"] = genealogy
+    _worker_state["node_degree"] = node_degree
+
+def _trace_one(analyze, *task):
+    return analyze(_worker_state["genealogy"], _worker_state["node_degree"], *task)
+
+def round_scores(results, decimals):
+    """Round the given fields of every result dict in place, one vectorized round per column
+
+    decimals maps field name to decimal places, as for DataFrame.round.
+    """
+    if not results:
+        return
+    columns = list(decimals)
+    rounded = pd.DataFrame(results, columns=columns).round(decimals).to_numpy().tolist()
+    for result, scores in zip(results, rounded):
+        result.update(zip(columns, scores))
@@ -9,52 +9,149 @@ Date: September 2025
 
 import sys
 import os
+from pathlib import Path
 import time
+from datetime import datetime
+import atexit
+import logging
+import logging.handlers
+import queue
 import json
 import hashlib
-from datetime import datetime
 import pandas as pd
 import numpy as np
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Stress test directory layout, resolved once at import
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+DATA = ROOT / "data"
+RESULTS = ROOT / "results"
+LOGS = ROOT / "logs"
+
+# Decimal places of the reported score fields
+SCORE_DECIMALS = {"mean_inheritance": 4, "max_inheritance": 4, "extended_phenotype_score": 4,
+                  "mutation_rate": 3}
+
 # Add RootFinder to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(str(ROOT.parent))
 from rootfinder.core import PolicyGenealogy
+from batch_common import trace_roots, round_scores
+
+class _IsoFormatter(logging.Formatter):
+    """Formatter stamping records like datetime.now().isoformat() (local, microseconds)"""
+    
+    def formatTime(self, record, datefmt=None):
+        return datetime.fromtimestamp(record.created).isoformat()
 
 class StressTestLogger:
-    """Logger for stress test execution and quality control"""
+    """Logger for stress test execution and quality control
+
+    Records go through a QueueHandler so the analysis loop never blocks on
+    stdout; a QueueListener thread prints them and buffers them for save_logs.
+    """
     
     def __init__(self, test_name):
         self.test_name = test_name
         self.start_time = time.time()
-        self.logs = []
         self.results = {}
         
+        self._buffer = logging.handlers.BufferingHandler(capacity=sys.maxsize)
+        self._buffer.setFormatter(_IsoFormatter("%(asctime)s [%(label)s] %(message)s"))
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(_IsoFormatter("[%(asctime)s] %(label)s: %(message)s"))
+        
+        log_queue = queue.SimpleQueue()
+        self._logger = logging.getLogger(f"stress_test.{test_name}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+        self._listener = logging.handlers.QueueListener(log_queue, console, self._buffer)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+        
     def log(self, message, level="INFO"):
-        timestamp = datetime.now().isoformat()
-        log_entry = {
-            "timestamp": timestamp,
-            "level": level,
-            "message": message
-        }
-        self.logs.append(log_entry)
-        print(f"[{timestamp}] {level}: {message}")
+        # Any label is accepted and printed as given; unknown ones log at INFO
+        levelno = logging.getLevelName(level)
+        if not isinstance(levelno, int):
+            levelno = logging.INFO
+        self._logger.log(levelno, message, extra={"label": level})
         
     def save_logs(self, output_dir):
         """Save execution logs to file"""
-        os.makedirs(output_dir, exist_ok=True)
-        log_file = os.path.join(output_dir, f"{self.test_name}_execution.log")
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        log_file = Path(output_dir) / f"{self.test_name}_execution.log"
         
+        # Drain pending records before writing, then resume listening
+        self._listener.stop()
         with open(log_file, 'w') as f:
-            for log_entry in self.logs:
-                f.write(f"{log_entry['timestamp']} [{log_entry['level']}] {log_entry['message']}\n")
+            for record in self._buffer.buffer:
+                f.write(self._buffer.format(record) + "\n")
+        self._listener.start()
                 
     def calculate_checksum(self, data):
-        """Calculate checksum for reproducibility validation"""
-        data_str = json.dumps(data, sort_keys=True)
-        return hashlib.md5(data_str.encode()).hexdigest()
+        """Calculate checksum for reproducibility validation (BLAKE2b-256)"""
+        hasher = hashlib.blake2b(digest_size=32)
+        _canonical_stream(data, hasher.update)
+        return hasher.hexdigest()
 
-def run_constitutional_analysis():
-    """Execute constitutional genealogy batch analysis"""
+def _dumps_leaf(value):
+    """Compact JSON bytes for a scalar (floats via json, so the digest doesn't depend on orjson)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if orjson is not None and not isinstance(value, float):
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode()
+
+def _json_key(key):
+    """Object key as json.dumps writes it: non-str keys become their JSON scalar text"""
+    if isinstance(key, str):
+        return key
+    if isinstance(key, np.generic):
+        key = key.item()
+    return json.dumps(key)
+
+def _canonical_stream(data, write):
+    """Feed data to write() as compact sorted-key JSON without building the whole document"""
+    if isinstance(data, dict):
+        try:
+            keys = sorted(data)
+        except TypeError:  # mixed key types, which json.dumps(sort_keys=True) rejects
+            keys = sorted(data, key=_json_key)
+        write(b"{")
+        for i, key in enumerate(keys):
+            if i:
+                write(b",")
+            write(_dumps_leaf(_json_key(key)))
+            write(b":")
+            _canonical_stream(data[key], write)
+        write(b"}")
+    elif isinstance(data, (list, tuple, np.ndarray)):
+        write(b"[")
+        for i, item in enumerate(data):
+            if i:
+                write(b",")
+            _canonical_stream(item, write)
+        write(b"]")
+    else:
+        write(_dumps_leaf(data))
+
+def run_constitutional_analysis(compress=False, parallel=None):
+    """Execute constitutional genealogy batch analysis
+
+    compress also writes a zstd-compressed copy of the detailed genealogies
+    (needs zstandard); the plain .json is always written. parallel is
+    passed to trace_roots (True forces worker processes).
+    """
     
     logger = StressTestLogger("constitutional_batch")
     logger.log("Starting Constitutional Genealogy Stress Test")
@@ -63,11 +160,13 @@ def run_constitutional_analysis():
     genealogy = PolicyGenealogy()
     
     # Load constitutional corpus
-    corpus_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'corpus_constitucional.csv')
+    corpus_path = DATA / "corpus_constitucional.csv"
     
     try:
         genealogy.load_corpus(corpus_path)
         logger.log(f"Successfully loaded constitutional corpus with {len(genealogy.policies)} nodes")
+        # In + out degree of every node, computed once for the centrality metric
+        node_degree = genealogy.node_degrees()
     except Exception as e:
         logger.log(f"ERROR loading corpus: {e}", "ERROR")
         return None
@@ -88,97 +187,107 @@ def run_constitutional_analysis():
     
     logger.log(f"Analyzing {len(constitutional_roots)} constitutional roots")
     
-    for root_id in constitutional_roots:
+    # Roots are independent sub-DAG traversals (traced in worker processes
+    # only for large batches or when asked to)
+    outcomes = trace_roots(analyze_root, genealogy, node_degree,
+                           [(root_id,) for root_id in constitutional_roots], parallel)
+    for root_id, outcome in zip(constitutional_roots, outcomes):
         logger.log(f"Tracing lineage for {root_id}")
         
         try:
-            # Trace complete lineage
-            lineage = genealogy.trace_lineage(root_id)
-            
-            # Calculate extended phenotype score
-            phenotype_score = genealogy._calculate_phenotype_score(lineage.root_policy)
-            
-            # Collect comprehensive metrics
-            result = {
-                "root_id": root_id,
-                "root_name": lineage.root_policy.name,
-                "jurisdiction": "Argentina" if "ARG" in root_id else "Uruguay",
-                "year_created": lineage.root_policy.year_created,
-                "survival_years": lineage.root_policy.survival_years,
-                "descendants_count": lineage.total_descendants,
-                "ancestors_count": len(lineage.ancestors),
-                "mean_inheritance": round(lineage.mean_inheritance, 4),
-                "max_inheritance": round(lineage.max_inheritance, 4),
-                "extended_phenotype_score": round(phenotype_score, 4),
-                "ideology": lineage.root_policy.ideology if hasattr(lineage.root_policy, 'ideology') else 'Constitutional',
-                "mutation_rate": calculate_mutation_rate(lineage),
-                "network_centrality": calculate_centrality(genealogy, root_id)
-            }
-            
+            result, lineage_data = outcome()
             batch_results.append(result)
             
             # Store detailed genealogy for export
             detailed_genealogies[root_id] = {
-                "lineage_data": genealogy.export_genealogy(root_id, format="json"),
+                "lineage_data": lineage_data,
                 "metrics": result
             }
             
-            logger.log(f"  {root_id}: {result['survival_years']} years, {result['descendants_count']} descendants, inheritance={result['mean_inheritance']}")
-            
         except Exception as e:
             logger.log(f"ERROR analyzing {root_id}: {e}", "ERROR")
             continue
     
+    # Round the reported scores once over the whole batch; the detailed
+    # genealogies share these result dicts
+    round_scores(batch_results, SCORE_DECIMALS)
+    for result in batch_results:
+        logger.log(f"  {result['root_id']}: {result['survival_years']} years, {result['descendants_count']} descendants, inheritance={result['mean_inheritance']}")
+    
     # Quality control tests
     logger.log("Running quality control tests")
     qc_results = run_quality_control(genealogy, constitutional_roots, logger)
     
     # Export results
-    results_dir = os.path.join(os.path.dirname(__file__), '..', 'results')
-    export_results(batch_results, detailed_genealogies, qc_results, results_dir, logger)
+    export_results(batch_results, detailed_genealogies, qc_results, RESULTS, logger, compress)
     
     # Save logs
-    logs_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
-    logger.save_logs(logs_dir)
+    logger.save_logs(LOGS)
     
     logger.log("Constitutional batch analysis completed successfully")
     return batch_results
 
+def analyze_root(genealogy, node_degree, root_id):
+    """Trace one constitutional root and return its metrics and JSON lineage export"""
+    
+    # Trace complete lineage
+    lineage = genealogy.trace_lineage(root_id)
+    
+    # Calculate extended phenotype score
+    phenotype_score = genealogy._calculate_phenotype_score(lineage.root_policy)
+    
+    # Collect comprehensive metrics
+    result = {
+        "root_id": root_id,
+        "root_name": lineage.root_policy.name,
+        "jurisdiction": "Argentina" if "ARG" in root_id else "Uruguay",
+        "year_created": lineage.root_policy.year_created,
+        "survival_years": lineage.root_policy.survival_years,
+        "descendants_count": lineage.total_descendants,
+        "ancestors_count": len(lineage.ancestors),
+        "mean_inheritance": lineage.mean_inheritance,
+        "max_inheritance": lineage.max_inheritance,
+        "extended_phenotype_score": phenotype_score,
+        "ideology": lineage.root_policy.ideology,
+        "mutation_rate": calculate_mutation_rate(lineage),
+        "network_centrality": calculate_centrality(node_degree, root_id)
+    }
+    
+    return result, genealogy.export_genealogy_dict(root_id)
+
 def calculate_mutation_rate(lineage):
     """Calculate mutation rate (changes per decade) for a policy lineage"""
     if not lineage.descendants:
         return 0.0
     
-    # Simplified mutation rate based on inheritance variance
-    inheritance_scores = list(lineage.inheritance_scores.values())
-    if not inheritance_scores:
+    # Simplified mutation rate based on inheritance variance (reported
+    # rounded to 3 dp by round_scores)
+    inheritance_scores = lineage.inheritance_array
+    if not inheritance_scores.size:
         return 0.0
     
-    variance = np.var(inheritance_scores)
     time_span = lineage.root_policy.survival_years / 10  # decades
     
-    return round(variance / max(time_span, 1), 3)
+    return inheritance_scores.var() / max(time_span, 1)
 
-def calculate_centrality(genealogy, node_id):
+def calculate_centrality(node_degree, node_id):
     """Calculate network centrality for a node"""
-    # Simplified centrality based on total connections
-    in_degree = len(list(genealogy.genealogy_graph.predecessors(node_id)))
-    out_degree = len(list(genealogy.genealogy_graph.successors(node_id)))
-    
-    return in_degree + out_degree
+    # Simplified centrality based on total connections (in + out degree)
+    return node_degree[node_id]
 
 def run_quality_control(genealogy, test_roots, logger):
     """Execute quality control tests for reproducibility and stability"""
     
-    logger.log("QC Test 1: Reproducibility (3 identical runs)")
+    logger.log("QC Test 1: Reproducibility (baseline vs independent re-run)")
     reproducibility_results = []
     
-    # Test reproducibility with 3 identical runs
-    for run in range(3):
+    # Tracing is deterministic, so the cached baseline plus one uncached
+    # re-run catches nondeterminism; further identical runs add nothing
+    for use_cache in (True, False):
         run_results = []
         for root_id in test_roots[:3]:  # Test first 3 roots
             try:
-                lineage = genealogy.trace_lineage(root_id)
+                lineage = genealogy.trace_lineage(root_id, use_cache=use_cache)
                 metrics = {
                     "survival_years": lineage.root_policy.survival_years,
                     "descendants": lineage.total_descendants,
@@ -190,9 +299,11 @@ def run_quality_control(genealogy, test_roots, logger):
         reproducibility_results.append(run_results)
     
     # Calculate reproducibility variance
-    if len(reproducibility_results) == 3 and all(len(r) > 0 for r in reproducibility_results):
+    if all(len(r) > 0 for r in reproducibility_results):
         variance_test = calculate_reproducibility_variance(reproducibility_results)
         logger.log(f"  Reproducibility variance: {variance_test:.6f} (target: < 0.01)")
+        baseline, rerun = reproducibility_results
+        logger.log(f"  Re-run identical to baseline: {baseline == rerun}")
     
     logger.log("QC Test 2: Perturbation resistance")
     # Test with text perturbations would go here
@@ -209,12 +320,12 @@ def run_quality_control(genealogy, test_roots, logger):
 def calculate_reproducibility_variance(results_list):
     """Calculate variance across reproducibility runs"""
     # Extract mean_inheritance values from all runs
-    inheritance_values = []
-    for run_results in results_list:
-        for result in run_results:
-            inheritance_values.append(result.get('mean_inheritance', 0))
+    inheritance_values = np.fromiter(
+        (result.get('mean_inheritance', 0) for run_results in results_list for result in run_results),
+        dtype=np.float64
+    )
     
-    return np.var(inheritance_values) if inheritance_values else 1.0
+    return inheritance_values.var() if inheritance_values.size else 1.0
 
 def validate_gold_standard(genealogy, logger):
     """Validate against known genealogical relationships"""
@@ -243,12 +354,8 @@ def validate_gold_standard(genealogy, logger):
         try:
             parent_lineage = genealogy.trace_lineage(standard["parent"])
             
-            # Find the child in descendants
-            child_inheritance = None
-            for desc in parent_lineage.descendants:
-                if desc.id == standard["child"]:
-                    child_inheritance = parent_lineage.inheritance_scores.get(desc.id, 0)
-                    break
+            # inheritance_scores is keyed by descendant id, so it doubles as the descendant index
+            child_inheritance = parent_lineage.inheritance_scores.get(standard["child"])
             
             if child_inheritance is not None:
                 expected = standard["expected_inheritance"]
@@ -267,32 +374,42 @@ def validate_gold_standard(genealogy, logger):
     
     return mean_concordance
 
-def export_results(batch_results, detailed_genealogies, qc_results, output_dir, logger):
+def export_results(batch_results, detailed_genealogies, qc_results, output_dir, logger, compress=False):
     """Export all analysis results to files"""
     
-    os.makedirs(output_dir, exist_ok=True)
+    if compress and zstandard is None:
+        raise ImportError("compress requires zstandard")
+    
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
     
     # Main results table
     df_results = pd.DataFrame(batch_results)
-    results_file = os.path.join(output_dir, "constitutional_analysis_results.csv")
+    results_file = Path(output_dir) / "constitutional_analysis_results.csv"
     df_results.to_csv(results_file, index=False)
     logger.log(f"Exported main results to {results_file}")
     
-    # Detailed genealogies as JSON
-    genealogies_file = os.path.join(output_dir, "constitutional_genealogies_detailed.json")
-    with open(genealogies_file, 'w') as f:
-        json.dump(detailed_genealogies, f, indent=2)
+    # Detailed genealogies as JSON, plus a zstd copy when asked for
+    if orjson is not None:
+        data = orjson.dumps(detailed_genealogies, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        data = json.dumps(detailed_genealogies, indent=2, ensure_ascii=False).encode()
+    genealogies_file = Path(output_dir) / "constitutional_genealogies_detailed.json"
+    genealogies_file.write_bytes(data)
     logger.log(f"Exported detailed genealogies to {genealogies_file}")
+    if compress:
+        compressed_file = genealogies_file.with_name(genealogies_file.name + ".zst")
+        compressed_file.write_bytes(zstandard.ZstdCompressor(level=3).compress(data))
+        logger.log(f"Exported compressed genealogies to {compressed_file}")
     
     # Quality control report
-    qc_file = os.path.join(output_dir, "constitutional_quality_control.json")
+    qc_file = Path(output_dir) / "constitutional_quality_control.json"
     with open(qc_file, 'w') as f:
         json.dump(qc_results, f, indent=2)
     logger.log(f"Exported QC results to {qc_file}")
     
     # Summary statistics
     summary = generate_summary_stats(df_results)
-    summary_file = os.path.join(output_dir, "constitutional_summary_stats.json")
+    summary_file = Path(output_dir) / "constitutional_summary_stats.json"
     with open(summary_file, 'w') as f:
         json.dump(summary, f, indent=2)
     logger.log(f"Exported summary statistics to {summary_file}")
@@ -300,29 +417,43 @@ def export_results(batch_results, detailed_genealogies, qc_results, output_dir,
 def generate_summary_stats(df):
     """Generate summary statistics for the batch results"""
     
-    arg_policies = df[df['jurisdiction'] == 'Argentina']
-    uru_policies = df[df['jurisdiction'] == 'Uruguay']
+    # One grouped pass; a jurisdiction without rows reports zeros
+    by_jurisdiction = df.groupby('jurisdiction').agg(
+        policies=('survival_years', 'size'),
+        mean_survival=('survival_years', 'mean'),
+        mean_inheritance=('mean_inheritance', 'mean'),
+        total_descendants=('descendants_count', 'sum')
+    ).to_dict(orient='index')
+    no_rows = dict.fromkeys(("policies", "mean_survival", "mean_inheritance", "total_descendants"), 0)
+    arg = by_jurisdiction.get('Argentina', no_rows)
+    uru = by_jurisdiction.get('Uruguay', no_rows)
     
     summary = {
         "total_policies_analyzed": len(df),
-        "argentina_policies": len(arg_policies),
-        "uruguay_policies": len(uru_policies),
-        "mean_survival_argentina": float(arg_policies['survival_years'].mean()) if len(arg_policies) > 0 else 0,
-        "mean_survival_uruguay": float(uru_policies['survival_years'].mean()) if len(uru_policies) > 0 else 0,
-        "mean_inheritance_argentina": float(arg_policies['mean_inheritance'].mean()) if len(arg_policies) > 0 else 0,
-        "mean_inheritance_uruguay": float(uru_policies['mean_inheritance'].mean()) if len(uru_policies) > 0 else 0,
-        "total_descendants_argentina": int(arg_policies['descendants_count'].sum()) if len(arg_policies) > 0 else 0,
-        "total_descendants_uruguay": int(uru_policies['descendants_count'].sum()) if len(uru_policies) > 0 else 0,
-        "max_survival_policy": df.loc[df['survival_years'].idxmax()]['root_name'] if len(df) > 0 else None,
-        "max_descendants_policy": df.loc[df['descendants_count'].idxmax()]['root_name'] if len(df) > 0 else None,
-        "highest_inheritance_policy": df.loc[df['mean_inheritance'].idxmax()]['root_name'] if len(df) > 0 else None
+        "argentina_policies": arg['policies'],
+        "uruguay_policies": uru['policies'],
+        "mean_survival_argentina": arg['mean_survival'],
+        "mean_survival_uruguay": uru['mean_survival'],
+        "mean_inheritance_argentina": arg['mean_inheritance'],
+        "mean_inheritance_uruguay": uru['mean_inheritance'],
+        "total_descendants_argentina": arg['total_descendants'],
+        "total_descendants_uruguay": uru['total_descendants'],
+        "max_survival_policy": None,
+        "max_descendants_policy": None,
+        "highest_inheritance_policy": None
     }
     
+    if len(df) > 0:
+        summary["max_survival_policy"] = df.loc[df['survival_years'].idxmax(), 'root_name']
+        summary["max_descendants_policy"] = df.loc[df['descendants_count'].idxmax(), 'root_name']
+        summary["highest_inheritance_policy"] = df.loc[df['mean_inheritance'].idxmax(), 'root_name']
+    
     return summary
 
 if __name__ == "__main__":
     print("=== RootFinder Constitutional Stress Test ===")
-    results = run_constitutional_analysis()
+    results = run_constitutional_analysis(compress="--compress" in sys.argv[1:],
+                                          parallel=True if "--parallel" in sys.argv[1:] else None)
     
     if results:
         print(f"\n✅ Stress test completed successfully!")
@@ -9,18 +9,84 @@ Date: September 2025
 
 import sys
 import os
+from pathlib import Path
 import time
 import json
+import re
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Stress test directory layout, resolved once at import
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+DATA = ROOT / "data"
+RESULTS = ROOT / "results"
+LOGS = ROOT / "logs"
+
 # Add RootFinder to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(str(ROOT.parent))
 from rootfinder.core import PolicyGenealogy
+from batch_common import trace_roots, round_scores
+
+# Cultural compatibility proxy by ideology (Argentine context)
+CULTURAL_FIT = {
+    "Populist": 0.8,  # High compatibility in Argentine context
+    "Liberal": 0.3    # Lower compatibility historically
+}
+
+# Simplicity proxy by policy-name fragment, first match wins
+SIMPLICITY_BY_FRAGMENT = (
+    ("aguinaldo", 0.9),        # Very simple concept
+    ("salario", 0.9),
+    ("convertibilidad", 0.3),  # Complex financial mechanisms
+    ("afjp", 0.3)
+)
+
+# Decimal places of the reported score fields
+SCORE_DECIMALS = {"mean_inheritance": 4, "max_inheritance": 4, "extended_phenotype_score": 4,
+                  "memetic_fitness": 4}
+
+JURISDICTION_BY_PREFIX = {
+    "ARG": "Argentina",
+    "URU": "Uruguay",
+    "CHI": "Chile"
+}
+
+# Policy families by name fragment, in priority order
+POLICY_FAMILY_FRAGMENTS = (
+    ("Labor_Benefits", ("aguinaldo", "salario")),
+    ("Healthcare", ("obras sociales", "salud")),
+    ("Labor_Protection", ("indemniz", "severance")),
+    ("Collective_Bargaining", ("paritarias", "convenios")),
+    ("Monetary_Policy", ("convertibilidad", "cambiario")),
+    ("Pension_Systems", ("afjp", "afp", "afap")),
+    ("Trade_Policy", ("apertura", "retenciones"))
+)
+_FAMILY_RANK = {
+    fragment: (rank, family)
+    for rank, (family, fragments) in enumerate(POLICY_FAMILY_FRAGMENTS)
+    for fragment in fragments
+}
+# One pass over the name finds every (possibly overlapping) fragment
+_FAMILY_PATTERN = re.compile("(?=(%s))" % "|".join(map(re.escape, _FAMILY_RANK)))
 
-def run_policies_analysis():
-    """Execute public policies genealogy batch analysis"""
+def run_policies_analysis(use_arrow=False, parallel=None):
+    """Execute public policies genealogy batch analysis
+
+    use_arrow writes the tables with pyarrow (plus a Parquet copy of the
+    combined results). Its CSV quoting and boolean spelling differ from
+    pandas', so the default pandas output is the one checksummed. parallel
+    is passed to trace_roots (True forces worker processes).
+    """
     
     print("=== RootFinder Policies Stress Test ===")
     start_time = time.time()
@@ -29,11 +95,13 @@ def run_policies_analysis():
     genealogy = PolicyGenealogy()
     
     # Load policies corpus
-    corpus_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'corpus_policies_extended.csv')
+    corpus_path = DATA / "corpus_policies_extended.csv"
     
     try:
         genealogy.load_corpus(corpus_path)
         print(f"✅ Loaded policies corpus with {len(genealogy.policies)} nodes")
+        # In + out degree of every node, computed once for the network metric
+        node_degree = genealogy.node_degrees()
     except Exception as e:
         print(f"❌ ERROR loading corpus: {e}")
         return None
@@ -62,46 +130,26 @@ def run_policies_analysis():
     all_results = {}
     survival_data = []
     
+    # Roots are independent sub-DAG traversals (traced in worker processes
+    # only for large batches or when asked to)
+    outcomes = trace_roots(analyze_root, genealogy, node_degree,
+                           [(category, root_id) for category, roots in policy_roots.items() for root_id in roots],
+                           parallel)
     for category, roots in policy_roots.items():
         print(f"\n🔍 Analyzing {category} policies...")
         category_results = []
         
-        for root_id in roots:
+        for root_id, outcome in zip(roots, outcomes):
             try:
                 print(f"  Tracing {root_id}...")
-                lineage = genealogy.trace_lineage(root_id)
-                
-                # Calculate comprehensive metrics
-                phenotype_score = genealogy._calculate_phenotype_score(lineage.root_policy)
-                memetic_fitness = calculate_memetic_fitness(lineage.root_policy, genealogy)
-                
-                result = {
-                    "policy_id": root_id,
-                    "policy_name": lineage.root_policy.name,
-                    "category": category,
-                    "jurisdiction": extract_jurisdiction(root_id),
-                    "ideology": determine_ideology(category, root_id),
-                    "year_created": lineage.root_policy.year_created,
-                    "year_terminated": getattr(lineage.root_policy, 'year_terminated', None),
-                    "survival_years": lineage.root_policy.survival_years,
-                    "is_active": lineage.root_policy.is_active,
-                    "descendants_count": lineage.total_descendants,
-                    "ancestors_count": len(lineage.ancestors),
-                    "mean_inheritance": round(lineage.mean_inheritance, 4),
-                    "max_inheritance": round(lineage.max_inheritance, 4),
-                    "extended_phenotype_score": round(phenotype_score, 4),
-                    "memetic_fitness": round(memetic_fitness, 4),
-                    "network_degree": calculate_network_degree(genealogy, root_id),
-                    "policy_family": extract_policy_family(lineage.root_policy.name)
-                }
-                
+                result = outcome()
                 category_results.append(result)
                 
                 # Prepare survival analysis data
                 survival_entry = {
                     "policy_id": root_id,
-                    "time": lineage.root_policy.survival_years,
-                    "event": 0 if lineage.root_policy.is_active else 1,
+                    "time": result["survival_years"],
+                    "event": 0 if result["is_active"] else 1,
                     "ideology": result["ideology"],
                     "jurisdiction": result["jurisdiction"],
                     "category": category
@@ -116,13 +164,16 @@ def run_policies_analysis():
         
         all_results[category] = category_results
     
+    # Round the reported scores once over every category's results
+    round_scores([result for results in all_results.values() for result in results], SCORE_DECIMALS)
+    
     # Generate comparative analysis
     print("\n📊 Generating comparative analysis...")
     comparative_stats = generate_comparative_stats(all_results)
     
     # Export results
-    results_dir = os.path.join(os.path.dirname(__file__), '..', 'results')
-    export_policies_results(all_results, survival_data, comparative_stats, results_dir)
+    results_dir = RESULTS
+    export_policies_results(all_results, survival_data, comparative_stats, results_dir, use_arrow)
     
     execution_time = time.time() - start_time
     print(f"\n✅ Policies batch analysis completed in {execution_time:.2f} seconds")
@@ -130,62 +181,73 @@ def run_policies_analysis():
     
     return all_results
 
-def calculate_memetic_fitness(policy, genealogy):
-    """Calculate memetic fitness score for a policy"""
-    
-    # Get policy lineage for fitness calculation
-    lineage = genealogy.trace_lineage(policy.id)
+def analyze_root(genealogy, node_degree, category, root_id):
+    """Trace one policy root and return its comparative metrics"""
     
-    # Memetic fitness components (simplified version)
+    lineage = genealogy.trace_lineage(root_id)
     
-    # 1. Transmission success (descendants)
-    transmission = min(lineage.total_descendants / 10.0, 1.0)
+    # Calculate comprehensive metrics
+    phenotype_score = genealogy._calculate_phenotype_score(lineage.root_policy)
+    memetic_fitness = calculate_memetic_fitness(lineage.root_policy, lineage)
     
-    # 2. Persistence (survival normalized)
-    persistence = min(policy.survival_years / 80.0, 1.0)
+    return {
+        "policy_id": root_id,
+        "policy_name": lineage.root_policy.name,
+        "category": category,
+        "jurisdiction": extract_jurisdiction(root_id),
+        "ideology": determine_ideology(category, root_id),
+        "year_created": lineage.root_policy.year_created,
+        "year_terminated": lineage.root_policy.year_terminated,
+        "survival_years": lineage.root_policy.survival_years,
+        "is_active": lineage.root_policy.is_active,
+        "descendants_count": lineage.total_descendants,
+        "ancestors_count": len(lineage.ancestors),
+        "mean_inheritance": lineage.mean_inheritance,
+        "max_inheritance": lineage.max_inheritance,
+        "extended_phenotype_score": phenotype_score,
+        "memetic_fitness": memetic_fitness,
+        "network_degree": calculate_network_degree(node_degree, root_id),
+        "policy_family": extract_policy_family(lineage.root_policy.name)
+    }
+
+def calculate_memetic_fitness(policy, lineage):
+    """Calculate memetic fitness score for a policy from its traced lineage"""
     
-    # 3. Inheritance fidelity
+    # Inheritance fidelity
     fidelity = lineage.mean_inheritance if lineage.inheritance_scores else 0.5
     
-    # 4. Cultural compatibility (ideology-based proxy)
-    if hasattr(policy, 'ideology'):
-        if policy.ideology == "Populist":
-            cultural_fit = 0.8  # High compatibility in Argentine context
-        elif policy.ideology == "Liberal":  
-            cultural_fit = 0.3  # Lower compatibility historically
-        else:
-            cultural_fit = 0.5
-    else:
-        cultural_fit = 0.5
-    
-    # 5. Simplicity proxy (inverse of policy complexity)
-    # Simplified based on policy type
-    if "aguinaldo" in policy.name.lower() or "salario" in policy.name.lower():
-        simplicity = 0.9  # Very simple concept
-    elif "convertibilidad" in policy.name.lower() or "afjp" in policy.name.lower():
-        simplicity = 0.3  # Complex financial mechanisms
-    else:
-        simplicity = 0.6
+    return _memetic_fitness_kernel(float(lineage.total_descendants),
+                                   float(policy.survival_years),
+                                   fidelity,
+                                   CULTURAL_FIT.get(policy.ideology, 0.5),
+                                   simplicity_proxy(policy.name))
+
+def simplicity_proxy(policy_name):
+    """Simplicity proxy (inverse of policy complexity) from the policy name"""
+    name_lower = policy_name.lower()
+    for fragment, simplicity in SIMPLICITY_BY_FRAGMENT:
+        if fragment in name_lower:
+            return simplicity
+    return 0.6
+
+def _memetic_fitness_kernel(descendants, survival, fidelity, cultural_fit, simplicity):
+    """Weighted memetic fitness from numeric components (simplified version)"""
+    # 1. Transmission success (descendants)
+    transmission = min(descendants / 10.0, 1.0)
     
-    # Weighted average
-    fitness = (transmission * 0.25 + 
-               persistence * 0.25 + 
-               fidelity * 0.2 + 
-               cultural_fit * 0.2 + 
-               simplicity * 0.1)
+    # 2. Persistence (survival normalized)
+    persistence = min(survival / 80.0, 1.0)
     
-    return fitness
+    # Weighted average
+    return (transmission * 0.25 + 
+            persistence * 0.25 + 
+            fidelity * 0.2 + 
+            cultural_fit * 0.2 + 
+            simplicity * 0.1)
 
 def extract_jurisdiction(policy_id):
     """Extract jurisdiction from policy ID"""
-    if policy_id.startswith("ARG"):
-        return "Argentina"
-    elif policy_id.startswith("URU"):
-        return "Uruguay"  
-    elif policy_id.startswith("CHI"):
-        return "Chile"
-    else:
-        return "Unknown"
+    return JURISDICTION_BY_PREFIX.get(policy_id[:3], "Unknown")
 
 def determine_ideology(category, policy_id):
     """Determine ideological orientation"""
@@ -203,32 +265,16 @@ def determine_ideology(category, policy_id):
     else:
         return "Mixed"
 
-def calculate_network_degree(genealogy, node_id):
+def calculate_network_degree(node_degree, node_id):
     """Calculate network degree (total connections)"""
-    predecessors = list(genealogy.genealogy_graph.predecessors(node_id))
-    successors = list(genealogy.genealogy_graph.successors(node_id))
-    return len(predecessors) + len(successors)
+    return node_degree[node_id]
 
 def extract_policy_family(policy_name):
     """Extract policy family from name"""
-    name_lower = policy_name.lower()
-    
-    if "aguinaldo" in name_lower or "salario" in name_lower:
-        return "Labor_Benefits"
-    elif "obras sociales" in name_lower or "salud" in name_lower:
-        return "Healthcare"
-    elif "indemniz" in name_lower or "severance" in name_lower:
-        return "Labor_Protection" 
-    elif "paritarias" in name_lower or "convenios" in name_lower:
-        return "Collective_Bargaining"
-    elif "convertibilidad" in name_lower or "cambiario" in name_lower:
-        return "Monetary_Policy"
-    elif "afjp" in name_lower or "afp" in name_lower or "afap" in name_lower:
-        return "Pension_Systems"
-    elif "apertura" in name_lower or "retenciones" in name_lower:
-        return "Trade_Policy"
-    else:
+    matches = _FAMILY_PATTERN.findall(policy_name.lower())
+    if not matches:
         return "Other"
+    return min(_FAMILY_RANK[m] for m in matches)[1]
 
 def generate_comparative_stats(all_results):
     """Generate comparative statistics across categories and jurisdictions"""
@@ -243,6 +289,10 @@ def generate_comparative_stats(all_results):
     if df.empty:
         return {}
     
+    # Group once per dimension; the comparisons reuse these row indices
+    by_ideology = df.groupby('ideology', sort=False)
+    by_jurisdiction = df.groupby('jurisdiction', sort=False)
+    
     stats = {
         "overall_summary": {
             "total_policies": len(df),
@@ -257,48 +307,47 @@ def generate_comparative_stats(all_results):
         "by_policy_family": {},
         
         "survival_comparison": {
-            "populist_vs_liberal": compare_ideologies(df),
-            "argentina_vs_regional": compare_jurisdictions(df)
+            "populist_vs_liberal": compare_ideologies(df, by_ideology),
+            "argentina_vs_regional": compare_jurisdictions(df, by_jurisdiction)
         }
     }
     
-    # Statistics by ideology
-    for ideology in df['ideology'].unique():
-        subset = df[df['ideology'] == ideology]
-        stats["by_ideology"][ideology] = {
-            "count": len(subset),
-            "mean_survival": float(subset['survival_years'].mean()),
-            "mean_inheritance": float(subset['mean_inheritance'].mean()),
-            "mean_memetic_fitness": float(subset['memetic_fitness'].mean()),
-            "active_rate": float(subset['is_active'].mean())
-        }
-    
-    # Statistics by jurisdiction
-    for jurisdiction in df['jurisdiction'].unique():
-        subset = df[df['jurisdiction'] == jurisdiction]
-        stats["by_jurisdiction"][jurisdiction] = {
-            "count": len(subset),
-            "mean_survival": float(subset['survival_years'].mean()),
-            "mean_inheritance": float(subset['mean_inheritance'].mean()),
-            "most_persistent": subset.loc[subset['survival_years'].idxmax()]['policy_name'] if len(subset) > 0 else None
-        }
-    
-    # Statistics by policy family
-    for family in df['policy_family'].unique():
-        subset = df[df['policy_family'] == family]
-        stats["by_policy_family"][family] = {
-            "count": len(subset),
-            "mean_survival": float(subset['survival_years'].mean()),
-            "mean_fitness": float(subset['memetic_fitness'].mean())
-        }
+    # One grouped pass per dimension, keeping first-appearance group order
+    stats["by_ideology"] = by_ideology.agg(
+        count=('survival_years', 'size'),
+        mean_survival=('survival_years', 'mean'),
+        mean_inheritance=('mean_inheritance', 'mean'),
+        mean_memetic_fitness=('memetic_fitness', 'mean'),
+        active_rate=('is_active', 'mean')
+    ).to_dict(orient='index')
+    
+    stats["by_jurisdiction"] = by_jurisdiction.agg(
+        count=('survival_years', 'size'),
+        mean_survival=('survival_years', 'mean'),
+        mean_inheritance=('mean_inheritance', 'mean')
+    ).to_dict(orient='index')
+    most_persistent = df.loc[by_jurisdiction['survival_years'].idxmax(), ['jurisdiction', 'policy_name']]
+    for jurisdiction, policy_name in most_persistent.itertuples(index=False):
+        stats["by_jurisdiction"][jurisdiction]["most_persistent"] = policy_name
+    
+    stats["by_policy_family"] = df.groupby('policy_family', sort=False).agg(
+        count=('survival_years', 'size'),
+        mean_survival=('survival_years', 'mean'),
+        mean_fitness=('memetic_fitness', 'mean')
+    ).to_dict(orient='index')
     
     return stats
 
-def compare_ideologies(df):
+def group_rows(df, grouped, keys):
+    """Rows of df belonging to any of the given groups, in original row order"""
+    positions = [grouped.indices[key] for key in keys if key in grouped.indices]
+    return df.take(np.sort(np.concatenate(positions))) if positions else df.iloc[:0]
+
+def compare_ideologies(df, by_ideology):
     """Compare survival between populist and liberal policies"""
     
-    populist = df[df['ideology'] == 'Populist']
-    liberal = df[df['ideology'] == 'Liberal']
+    populist = group_rows(df, by_ideology, ['Populist'])
+    liberal = group_rows(df, by_ideology, ['Liberal'])
     
     if len(populist) == 0 or len(liberal) == 0:
         return {"error": "Insufficient data for comparison"}
@@ -312,11 +361,11 @@ def compare_ideologies(df):
         "fitness_difference": float(populist['memetic_fitness'].mean() - liberal['memetic_fitness'].mean())
     }
 
-def compare_jurisdictions(df):
+def compare_jurisdictions(df, by_jurisdiction):
     """Compare Argentina vs regional policies"""
     
-    argentina = df[df['jurisdiction'] == 'Argentina']
-    regional = df[df['jurisdiction'].isin(['Uruguay', 'Chile'])]
+    argentina = group_rows(df, by_jurisdiction, ['Argentina'])
+    regional = group_rows(df, by_jurisdiction, ['Uruguay', 'Chile'])
     
     if len(argentina) == 0 or len(regional) == 0:
         return {"error": "Insufficient data for comparison"}
@@ -328,45 +377,68 @@ def compare_jurisdictions(df):
         "regional_inheritance": float(regional['mean_inheritance'].mean())
     }
 
-def export_policies_results(all_results, survival_data, comparative_stats, output_dir):
-    """Export all policies analysis results"""
-    
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Main results by category
-    for category, results in all_results.items():
-        if results:
-            df = pd.DataFrame(results)
-            filename = os.path.join(output_dir, f"policies_{category}_results.csv")
-            df.to_csv(filename, index=False)
-            print(f"  ✓ Exported {category} results to {filename}")
-    
-    # Combined results
-    all_flat = []
-    for results_list in all_results.values():
-        all_flat.extend(results_list)
-    
-    if all_flat:
-        df_combined = pd.DataFrame(all_flat)
-        combined_file = os.path.join(output_dir, "policies_combined_results.csv")
-        df_combined.to_csv(combined_file, index=False)
-        print(f"  ✓ Exported combined results to {combined_file}")
-    
-    # Survival data for R analysis
-    if survival_data:
-        df_survival = pd.DataFrame(survival_data)
-        survival_file = os.path.join(output_dir, "policies_survival_data.csv")
-        df_survival.to_csv(survival_file, index=False)
-        print(f"  ✓ Exported survival data to {survival_file}")
+def export_policies_results(all_results, survival_data, comparative_stats, output_dir, use_arrow=False):
+    """Export all policies analysis results (optionally via pyarrow, see run_policies_analysis)"""
+    
+    if use_arrow and pa is None:
+        raise ImportError("use_arrow requires pyarrow")
+    
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    
+    all_flat = [result for results_list in all_results.values() for result in results_list]
+    
+    if use_arrow:
+        # Build the Arrow table once; per-category files are filtered slices
+        if all_flat:
+            table = pa.Table.from_pylist(all_flat)
+            for category, results in all_results.items():
+                if results:
+                    filename = Path(output_dir) / f"policies_{category}_results.csv"
+                    pa_csv.write_csv(table.filter(pc.equal(table["category"], category)), filename)
+                    print(f"  ✓ Exported {category} results to {filename}")
+            
+            combined_file = Path(output_dir) / "policies_combined_results.csv"
+            pa_csv.write_csv(table, combined_file)
+            pq.write_table(table, Path(output_dir) / "policies_combined_results.parquet")
+            print(f"  ✓ Exported combined results to {combined_file}")
+        
+        # Survival data for R analysis
+        if survival_data:
+            survival_file = Path(output_dir) / "policies_survival_data.csv"
+            pa_csv.write_csv(pa.Table.from_pylist(survival_data), survival_file)
+            print(f"  ✓ Exported survival data to {survival_file}")
+    else:
+        # Main results by category
+        for category, results in all_results.items():
+            if results:
+                df = pd.DataFrame(results)
+                filename = Path(output_dir) / f"policies_{category}_results.csv"
+                df.to_csv(filename, index=False)
+                print(f"  ✓ Exported {category} results to {filename}")
+        
+        # Combined results
+        if all_flat:
+            df_combined = pd.DataFrame(all_flat)
+            combined_file = Path(output_dir) / "policies_combined_results.csv"
+            df_combined.to_csv(combined_file, index=False)
+            print(f"  ✓ Exported combined results to {combined_file}")
+        
+        # Survival data for R analysis
+        if survival_data:
+            df_survival = pd.DataFrame(survival_data)
+            survival_file = Path(output_dir) / "policies_survival_data.csv"
+            df_survival.to_csv(survival_file, index=False)
+            print(f"  ✓ Exported survival data to {survival_file}")
     
     # Comparative statistics
-    stats_file = os.path.join(output_dir, "policies_comparative_stats.json")
+    stats_file = Path(output_dir) / "policies_comparative_stats.json"
     with open(stats_file, 'w') as f:
         json.dump(comparative_stats, f, indent=2)
     print(f"  ✓ Exported comparative stats to {stats_file}")
 
 if __name__ == "__main__":
-    results = run_policies_analysis()
+    results = run_policies_analysis(use_arrow="--arrow" in sys.argv[1:],
+                                    parallel=True if "--parallel" in sys.argv[1:] else None)
     
     if results:
         print("\n🎉 Policies stress test completed successfully!")
@@ -0,0 +1,22 @@
+"""
+Shared pytest configuration for the RootFinder test suite
+Author: Ignacio Adrian Lerer
+Date: September 2025
+"""
+
+import pytest
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", default=False,
+                     help="also run tests marked slow (filesystem round-trips)")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: touches the filesystem; skipped unless --run-slow")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="need --run-slow option to run")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
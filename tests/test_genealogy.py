@@ -7,41 +7,52 @@ Date: September 2025
 import pytest
 import sys
 import os
+import io
+import json
+import functools
+import textwrap
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from rootfinder import PolicyGenealogy, Policy
-import tempfile
-import pandas as pd
+
+# Sample policy corpus for testing, in the load_corpus CSV layout
+SAMPLE_CSV_TEXT = textwrap.dedent("""\
+    policy_id,policy_name,year_created,year_terminated,parent_policy,policy_type,government,survival_years,descendants_count,ideological_orientation
+    POL001,Test Policy 1,2000,,,Economic,Test Gov,25,2,Populist
+    POL002,Test Policy 2,2010,2020,POL001,Economic,Test Gov 2,10,0,Liberal
+    """)
+SAMPLE_CSV_BYTES = SAMPLE_CSV_TEXT.encode("utf-8")
+
+def _sample_policies():
+    """The sample corpus as Policy objects, for tests that don't exercise CSV parsing"""
+    return [
+        Policy(id="POL001", name="Test Policy 1", year_created=2000,
+               policy_type="Economic", government="Test Gov", ideology="Populist"),
+        Policy(id="POL002", name="Test Policy 2", year_created=2010, year_terminated=2020,
+               parent_id="POL001", policy_type="Economic", government="Test Gov 2",
+               ideology="Liberal")
+    ]
+
+@functools.lru_cache(maxsize=None)
+def _build_genealogy():
+    """Genealogy built from the sample policies once per process"""
+    genealogy = PolicyGenealogy()
+    genealogy.add_policies(_sample_policies())
+    return genealogy
 
 @pytest.fixture
-def sample_data():
-    """Create sample policy data for testing"""
-    return pd.DataFrame([
-        {
-            'policy_id': 'POL001',
-            'policy_name': 'Test Policy 1',
-            'year_created': 2000,
-            'year_terminated': None,
-            'parent_policy': None,
-            'policy_type': 'Economic',
-            'government': 'Test Gov',
-            'survival_years': 25,
-            'descendants_count': 2,
-            'ideological_orientation': 'Populist'
-        },
-        {
-            'policy_id': 'POL002', 
-            'policy_name': 'Test Policy 2',
-            'year_created': 2010,
-            'year_terminated': 2020,
-            'parent_policy': 'POL001',
-            'policy_type': 'Economic',
-            'government': 'Test Gov 2',
-            'survival_years': 10,
-            'descendants_count': 0,
-            'ideological_orientation': 'Liberal'
-        }
-    ])
+def loaded_genealogy():
+    """Shared genealogy for read-only tests; deepcopy it before mutating"""
+    return _build_genealogy()
+
+# One instance reused by the tests that load into it, reset before each use
+_SHARED_GENEALOGY = PolicyGenealogy()
+
+@pytest.fixture
+def genealogy():
+    """Empty genealogy for tests that load or mutate a corpus"""
+    _SHARED_GENEALOGY.reset()
+    return _SHARED_GENEALOGY
 
 def test_policy_creation():
     """Test Policy dataclass creation and properties"""
@@ -57,75 +68,181 @@ def test_policy_creation():
     assert policy.survival_years == 10
     assert not policy.is_active
 
-def test_load_corpus(sample_data):
-    """Test loading policy corpus from CSV"""
-    genealogy = PolicyGenealogy()
+@pytest.mark.slow
+def test_load_corpus_from_file(genealogy, tmp_path):
+    """Test loading policy corpus from a CSV file path"""
+    csv_file = tmp_path / "sample.csv"
+    csv_file.write_bytes(SAMPLE_CSV_BYTES)
     
-    # Create temporary CSV file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-        sample_data.to_csv(f.name, index=False)
-        temp_path = f.name
-    
-    try:
-        genealogy.load_corpus(temp_path)
-        assert len(genealogy.policies) == 2
-        assert "POL001" in genealogy.policies
-        assert genealogy.corpus_loaded
-    finally:
-        os.unlink(temp_path)
-
-def test_trace_lineage(sample_data):
-    """Test tracing policy lineage"""
-    genealogy = PolicyGenealogy()
+    genealogy.load_corpus(str(csv_file))
+    _check_load(genealogy)
+    assert genealogy.policies == _build_genealogy().policies
+
+def test_load_corpus_parses_na_and_float_years(genealogy):
+    """Test NA cells load as missing and float-formatted years as ints"""
+    genealogy.load_corpus(io.StringIO(textwrap.dedent("""\
+        policy_id,policy_name,year_created,year_terminated,parent_policy,policy_type,government,survival_years,descendants_count,ideological_orientation
+        POL001,Test Policy 1,2000.0,NA,NA,Economic,Test Gov,25,2,Populist
+        POL002,Test Policy 2,2010.0,2020.0,POL001,Economic,Test Gov 2,10,0,Liberal
+        """)))
+    
+    first, second = genealogy.policies["POL001"], genealogy.policies["POL002"]
+    assert first.year_created == 2000 and isinstance(first.year_created, int)
+    assert first.year_terminated is None
+    assert first.parent_id is None
+    assert second.year_terminated == 2020 and isinstance(second.year_terminated, int)
+    assert second.parent_id == "POL001"
+    assert second.survival_years == 10
+
+def test_blank_categorical_cells_never_match(genealogy):
+    """Test blank type/ideology cells load as missing and earn no similarity bonus"""
+    genealogy.load_corpus(io.StringIO(textwrap.dedent("""\
+        policy_id,policy_name,year_created,year_terminated,parent_policy,policy_type,government,survival_years,descendants_count,ideological_orientation
+        A,Policy A,2000,,,,,25,1,
+        B,Policy B,2010,,A,NA,,15,0,NA
+        """)))
+    parent, child = genealogy.policies["A"], genealogy.policies["B"]
+    assert parent.policy_type is None and child.ideology is None and parent.government is None
+    
+    assert genealogy.trace_lineage("A").inheritance_scores["B"] == pytest.approx(0.34)
+    assert genealogy._calculate_inheritance(parent, child) == pytest.approx(0.34)
+    score = genealogy._calculate_phenotype_score(parent)
+    assert parent in genealogy.find_extended_phenotypes(threshold=score)
+    assert parent not in genealogy.find_extended_phenotypes(threshold=score + 1e-9)
+
+def test_reset_clears_corpus(genealogy):
+    """Test reset returns a loaded genealogy to its empty state"""
+    genealogy.load_corpus(io.StringIO(SAMPLE_CSV_TEXT))
+    genealogy.trace_lineage("POL001")
+    genealogy.reset()
     
-    # Create temporary CSV file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-        sample_data.to_csv(f.name, index=False)
-        temp_path = f.name
-    
-    try:
-        genealogy.load_corpus(temp_path)
-        lineage = genealogy.trace_lineage("POL001")
-        
-        assert lineage.root_policy.id == "POL001"
-        assert len(lineage.descendants) == 1
-        assert lineage.descendants[0].id == "POL002"
-    finally:
-        os.unlink(temp_path)
-
-def test_extended_phenotypes(sample_data):
-    """Test extended phenotype identification"""
+    assert not genealogy.policies
+    assert not genealogy.corpus_loaded
+    assert genealogy.find_extended_phenotypes() == []
+    with pytest.raises(ValueError):
+        genealogy.trace_lineage("POL001")
+
+def _check_load(genealogy):
+    """Check the loaded corpus state"""
+    assert len(genealogy.policies) == 2
+    assert "POL001" in genealogy.policies
+    assert genealogy.corpus_loaded
+
+def _check_lineage(genealogy):
+    """Check tracing policy lineage"""
+    lineage = genealogy.trace_lineage("POL001")
+    
+    assert lineage.root_policy is genealogy.policies["POL001"]
+    assert len(lineage.descendants) == 1
+    assert lineage.descendants[0] is genealogy.policies["POL002"]
+
+def _check_phenotypes(genealogy):
+    """Check extended phenotype identification"""
+    phenotypes = genealogy.find_extended_phenotypes(threshold=0.0)
+    
+    assert len(phenotypes) >= 1
+    assert phenotypes[0] is genealogy.policies[phenotypes[0].id]
+
+def _check_export(genealogy):
+    """Check genealogy export functionality"""
+    json_output = genealogy.export_genealogy("POL001")
+    
+    assert isinstance(json_output, str)
+    data = json.loads(json_output)
+    assert data["root"]["id"] == "POL001"
+    assert [d["id"] for d in data["descendants"]] == ["POL002"]
+    assert data == genealogy.export_genealogy_dict("POL001")
+
+@pytest.mark.parametrize(
+    "check",
+    [_check_load, _check_lineage, _check_phenotypes, _check_export],
+    ids=["corpus_state", "trace_lineage", "extended_phenotypes", "export_genealogy"]
+)
+def test_loaded_genealogy(loaded_genealogy, check):
+    """Test each corpus check against the shared loaded genealogy"""
+    check(loaded_genealogy)
+
+def test_phenotype_scan_matches_scalar_score(loaded_genealogy):
+    """Test vectorized phenotype scan agrees with per-policy scoring"""
+    scores = {
+        p.id: loaded_genealogy._calculate_phenotype_score(p)
+        for p in loaded_genealogy.policies.values()
+    }
+    threshold = sorted(scores.values())[1]
+    
+    phenotypes = loaded_genealogy.find_extended_phenotypes(threshold=threshold)
+    expected = {pid for pid, score in scores.items() if score >= threshold}
+    assert {p.id for p in phenotypes} == expected
+
+def test_shared_policies_score_independently():
+    """Test a genealogy's scores don't change when its policies are loaded elsewhere"""
+    parent = Policy(id="A", name="A", year_created=2000, policy_type="Economic", ideology="Populist")
+    child = Policy(id="B", name="B", year_created=2010, parent_id="A",
+                   policy_type="Social", ideology="Liberal")
+    first = PolicyGenealogy()
+    first.add_policies([parent, child])
+    inheritance = first.trace_lineage("A", use_cache=False).inheritance_scores["B"]
+    phenotype = first._calculate_phenotype_score(parent)
+    
+    other = Policy(id="C", name="C", year_created=2005, policy_type="Social", ideology="Populist")
+    PolicyGenealogy().add_policies([other, child, parent])
+    
+    assert first.trace_lineage("A", use_cache=False).inheritance_scores["B"] == inheritance
+    assert first._calculate_phenotype_score(parent) == phenotype
+    assert first._calculate_inheritance(parent, child) == inheritance
+
+def test_cyclic_batch_is_rejected_atomically(loaded_genealogy):
+    """Test a batch closing a parent cycle raises and leaves the genealogy unchanged"""
     genealogy = PolicyGenealogy()
+    genealogy.add_policies(list(loaded_genealogy.policies.values()))
+    before = list(genealogy.policies)
+    cyclic = Policy(id="POL001", name="Cyclic", year_created=2000, parent_id="POL002")
+    
+    with pytest.raises(ValueError, match="cycle"):
+        genealogy.add_policies([cyclic])
+    
+    assert list(genealogy.policies) == before
+    assert genealogy.policies["POL001"].parent_id is None
+    assert genealogy.genealogy_graph.number_of_edges() == 1
+    assert [p.id for p in genealogy.trace_lineage("POL002").ancestors] == ["POL001"]
+
+def test_corpus_arrays(loaded_genealogy):
+    """Test the corpus-order arrays and ideology helpers agree with the policies"""
+    policies = list(loaded_genealogy.policies.values())
+    
+    assert list(loaded_genealogy.policies_array()) == policies
+    assert loaded_genealogy.survival_years_array().tolist() == [p.survival_years for p in policies]
+    assert loaded_genealogy.ideology_mask("Populist").tolist() == [p.ideology == "Populist" for p in policies]
+    assert not loaded_genealogy.ideology_mask("Unknown").any()
     
-    # Create temporary CSV file  
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-        sample_data.to_csv(f.name, index=False)
-        temp_path = f.name
-    
-    try:
-        genealogy.load_corpus(temp_path)
-        phenotypes = genealogy.find_extended_phenotypes(threshold=0.0)
-        
-        assert len(phenotypes) >= 1
-        assert phenotypes[0].id in genealogy.policies
-    finally:
-        os.unlink(temp_path)
-
-def test_export_genealogy(sample_data):
-    """Test genealogy export functionality"""
+    populist = [p.survival_years for p in policies if p.ideology == "Populist"]
+    assert loaded_genealogy.mean_survival_by_ideology("Populist") == sum(populist) / len(populist)
+    assert loaded_genealogy.mean_survival_by_ideology("Unknown") == 0.0
+
+def test_node_degrees(loaded_genealogy):
+    """Test node_degrees matches the genealogy graph's total degrees"""
+    degrees = loaded_genealogy.node_degrees()
+    assert degrees == dict(loaded_genealogy.genealogy_graph.degree())
+    assert degrees == {"POL001": 1, "POL002": 1}
+
+@pytest.mark.slow
+def test_export_genealogy_to_file(loaded_genealogy, tmp_path):
+    """Test the file export writes exactly export_genealogy's JSON"""
+    output_file = tmp_path / "genealogy.json"
+    loaded_genealogy.export_genealogy_to_file("POL001", str(output_file))
+    assert output_file.read_text(encoding="utf-8") == loaded_genealogy.export_genealogy("POL001")
+
+def test_replacing_policy_moves_its_graph_edge():
+    """Test re-adding a policy under a new parent updates lineages and graph alike"""
     genealogy = PolicyGenealogy()
+    genealogy.add_policies([
+        Policy(id="A", name="A", year_created=2000),
+        Policy(id="B", name="B", year_created=2001),
+        Policy(id="C", name="C", year_created=2002, parent_id="A"),
+    ])
+    genealogy.add_policy(Policy(id="C", name="C", year_created=2002, parent_id="B"))
     
-    # Create temporary CSV file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-        sample_data.to_csv(f.name, index=False)
-        temp_path = f.name
-    
-    try:
-        genealogy.load_corpus(temp_path)
-        json_output = genealogy.export_genealogy("POL001")
-        
-        assert isinstance(json_output, str)
-        assert "POL001" in json_output
-        assert "descendants" in json_output
-    finally:
-        os.unlink(temp_path)
\ No newline at end of file
+    assert genealogy.trace_lineage("A").descendants == []
+    assert [p.id for p in genealogy.trace_lineage("B").descendants] == ["C"]
+    assert set(genealogy.genealogy_graph.edges) == {("B", "C")}
+    assert genealogy.node_degrees() == {"A": 0, "B": 1, "C": 1}
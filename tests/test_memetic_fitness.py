@@ -0,0 +1,58 @@
+"""
+Test suite for the memetic fitness calculator
+Author: Ignacio Adrian Lerer
+Date: September 2025
+"""
+
+import pytest
+import os
+import importlib.util
+import numpy as np
+
+# The calculator lives in a hyphenated script, so load it by path
+_spec = importlib.util.spec_from_file_location(
+    "memetic_fitness_calculator",
+    os.path.join(os.path.dirname(__file__), '..', 'code', 'memetic-fitness-calculator.py')
+)
+memetic = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(memetic)
+
+FACTORS = [
+    memetic.MemeticFactors(8.5, 9.0, 9.0, 8.0, 10.0),
+    memetic.MemeticFactors(2.0, 1.5, 2.5, 3.0, 2.0),
+    memetic.MemeticFactors(5.0, 0.0, 7.0, 4.0, 6.0),  # a zero factor zeroes the product
+]
+MEME_TYPES = ["populist", "liberal", "technocratic"]
+
+@pytest.fixture
+def calculator():
+    return memetic.MemeticFitnessCalculator("Argentina")
+
+def test_score_batch_matches_total_fitness(calculator):
+    """Test score_batch agrees row by row with calculate_total_fitness"""
+    matrix = np.array([[f.cognitive_simplicity, f.gratification_speed, f.emotional_activation,
+                        f.tangibility, f.entry_cost] for f in FACTORS])
+
+    batch = calculator.score_batch(matrix, np.array(MEME_TYPES), 0.8)
+
+    expected = [calculator.calculate_total_fitness(f, t, 0.8)['total_fitness']
+                for f, t in zip(FACTORS, MEME_TYPES)]
+    assert batch == pytest.approx(expected, rel=1e-12)
+    assert batch[2] == 0.0
+
+@pytest.mark.parametrize("days, score", [
+    (0, 10.0), (1, 10.0), (2, 8.0), (7, 8.0), (8, 6.0),
+    (1825, 2.0), (1826, 1.0),
+])
+def test_gratification_speed_bins(calculator, days, score):
+    """Test bin edges are inclusive upper bounds, for scalars and arrays alike"""
+    scalar = calculator.calculate_gratification_speed(days)
+    assert scalar == score and isinstance(scalar, float)
+    assert calculator.calculate_gratification_speed(np.array([days]))[0] == score
+
+@pytest.mark.parametrize("meme_type", MEME_TYPES)
+def test_fast_total_fitness_matches_full_result(calculator, meme_type):
+    """Test fast=True returns exactly the full result's total_fitness"""
+    for factors in FACTORS:
+        full = calculator.calculate_total_fitness(factors, meme_type, 0.95)
+        assert calculator.calculate_total_fitness(factors, meme_type, 0.95, fast=True) == full['total_fitness']